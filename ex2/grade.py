@@ -8,7 +8,9 @@ import shutil
 import json
 import re
 import logging
+import sys
 import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from multiprocessing import Process, Queue
 
@@ -29,10 +31,21 @@ POINTS = {
 }
 TOTAL_POINTS = 100
 
+# Parallel Grading
+MEMORY_PER_WORKER = 2 * 1024 ** 3  # bytes of available RAM budgeted per grading worker (gcc + programs)
+MAX_TASKS_PER_CHILD = 16           # recycle each worker after this many submissions (Python 3.11+)
+POOL_CHUNKSIZE = 2
+
 # Initialize Logging
-def setup_logging():
+def setup_logging(log_filename=None):
+    """
+    Logs to the console and to a new timestamped file, or to log_filename when given,
+    so grading workers append to the log file opened by the main process.
+    Returns the log file path.
+    """
     os.makedirs(LOGS_DIR, exist_ok=True)
-    log_filename = os.path.join(LOGS_DIR, f'grading_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
+    if log_filename is None:
+        log_filename = os.path.join(LOGS_DIR, f'grading_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
     
     # Create a custom logger
     logger = logging.getLogger()
@@ -56,6 +69,7 @@ def setup_logging():
     if not logger.hasHandlers():
         logger.addHandler(file_handler)
         logger.addHandler(console_handler)
+    return log_filename
 
 # Extract Submission
 def extract_submission(archive_path, extract_path):
@@ -505,6 +519,38 @@ def process_submission(submission_folder):
 
     return log_entry
 
+# Available Memory
+def available_memory():
+    """
+    Bytes of memory available for new work: MemAvailable from /proc/meminfo, which counts
+    reclaimable page cache, falling back to the free pages (MemFree) from sysconf.
+    Returns None when neither can be read.
+    """
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (ValueError, OSError):
+        return None
+
+# Determine Number of Grading Workers
+def grading_worker_count():
+    """
+    Bounds the number of parallel grading workers by the CPU count and by the available
+    memory (MemAvailable, or MemFree from os.sysconf when /proc/meminfo cannot be read),
+    so concurrent gcc runs cannot push the grader into swap.
+    """
+    cpu_count = os.cpu_count() or 1
+    memory = available_memory()
+    if memory is None:
+        return cpu_count
+    return max(1, min(cpu_count, memory // MEMORY_PER_WORKER))
+
 # Generate JSON Summary
 def generate_json_summary(summary, output_path):
     try:
@@ -516,7 +562,7 @@ def generate_json_summary(summary, output_path):
 
 # Main Function
 def main():
-    setup_logging()
+    log_filename = setup_logging()
     logging.info("Starting grading process for Exercise 2 (ex2).")
 
     # Ensure necessary directories exist
@@ -529,7 +575,8 @@ def main():
     # Initialize summary list
     summary = []
 
-    # Iterate over each submission folder in submissions
+    # Collect submission folders
+    submission_folders = []
     for submission_folder in os.listdir(SUBMISSIONS_DIR):
         submission_path = os.path.join(SUBMISSIONS_DIR, submission_folder)
         if not os.path.isdir(submission_path):
@@ -537,11 +584,22 @@ def main():
             continue  # Skip non-directory items
 
         logging.info(f"Processing submission folder: {submission_folder}")
-
-        # Process the submission
-        log = process_submission(submission_folder)
-        summary.append(log)
-        logging.info(f"Finished processing: {submission_folder} | Final Score: {log['Final Score']}")
+        submission_folders.append(submission_folder)
+
+    # Grade submissions in parallel
+    max_workers = grading_worker_count()
+    pool_options = {'max_workers': max_workers}
+    if sys.version_info >= (3, 11):
+        # Recycled workers are started with 'spawn', so they set up logging again, into the same file
+        pool_options['max_tasks_per_child'] = MAX_TASKS_PER_CHILD
+        pool_options['initializer'] = setup_logging
+        pool_options['initargs'] = (log_filename,)
+    logging.info(f"Grading {len(submission_folders)} submissions with {max_workers} workers.")
+    with ProcessPoolExecutor(**pool_options) as executor:
+        logs = executor.map(process_submission, submission_folders, chunksize=POOL_CHUNKSIZE)
+        for submission_folder, log in zip(submission_folders, logs):
+            summary.append(log)
+            logging.info(f"Finished processing: {submission_folder} | Final Score: {log['Final Score']}")
 
     # Generate JSON Summary
     generate_json_summary(summary, summary_file)
@@ -5,14 +5,27 @@ import os
 import tarfile
 import subprocess
 import json
+import textwrap
+import hashlib
+import tempfile
+import sqlite3
+import threading
 import re
 import logging
+import logging.handlers
+import multiprocessing
 import time
 from datetime import datetime
-from multiprocessing import Process, Queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import zipfile
 import shutil
 import signal
+import resource
+
+try:
+    import orjson  # optional, much faster JSON encoder
+except ImportError:
+    orjson = None
 
 # Configuration Constants
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -20,11 +33,35 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 SUBMISSIONS_DIR = os.path.join(SCRIPT_DIR, 'submissions')
 SUMMARY_DIR = os.path.join(SCRIPT_DIR, 'summary')
 LOGS_DIR = os.path.join(SCRIPT_DIR, 'logs')
+RESULT_CACHE_DIR = os.path.join(SUMMARY_DIR, 'cache')  # graded results keyed by archive and grader hash
+MEMO_DB = os.path.join(SUMMARY_DIR, '.memo.sqlite')  # compilation results keyed by source content
+BUILD_CACHE_DIR = os.path.join(SUMMARY_DIR, 'build')  # compiled executables named by their memo key
+MEMO_MAX_ENTRIES = 10000  # least recently used memo entries beyond this are dropped
+HASH_CHUNK_SIZE = 1 << 20  # bytes read at a time when hashing archives
+EXTRACT_BUFFER_SIZE = 1 << 20  # bytes copied per read when extracting archive members
+HEADER_READ_SIZE = 8192  # bytes read at a time to get the first 10 lines of a README or source file
+
+# Patterns and suffixes checked for every submission, built once
+README_RE = re.compile(r'^readme(\.txt)?$', re.IGNORECASE)
+FOLDER_RE = re.compile(r'^(.*?)_(\d+)_assignsubmission_file$')
+INDENT_RE = re.compile(r'^ +', re.MULTILINE)  # structural indentation of a JSON document
+TAR_EXTS = ('.tgz', '.tar.gz')
+ARCHIVE_EXTS = TAR_EXTS + ('.zip',)
 # We extract files directly into the submission folder so that they remain available.
 WORKDIR = SUBMISSIONS_DIR  
 
 GCC_COMMAND = 'gcc'
+GCC_PATH = shutil.which(GCC_COMMAND) or GCC_COMMAND  # resolved once, not per compile
+GCC_FLAGS = ['-pipe', '-Wall']  # -pipe: compiler stages talk through pipes, not temp files
 TIMEOUT_EXECUTION = 60  # seconds for program execution
+TIMEOUT_SUBMISSION = 10 * TIMEOUT_EXECUTION  # seconds before a hung submission is abandoned
+READY_TIMEOUT = 2  # longest wait for a program to be ready before starting the next one (seconds)
+READY_POLL_INTERVAL = 0.02  # seconds between readiness checks
+COLLECT_GRACE = 1  # seconds still given to drain a program collected after its group's deadline
+OUTPUT_LIMIT = 64 * 1024  # bytes of a program's output kept in the summary
+LIMIT_FILE_SIZE = 10 << 20  # bytes a program may write to a single file, its spooled output included
+SPOOL_DIR = '/dev/shm' if os.access('/dev/shm', os.W_OK) else None  # tmpfs for captured output; None: default temp dir
+FRONTEND_INPUT = b"p\n2 3897 100 17 0\n" + b"a\n3879 + 17\n"  # fed to the Program C frontend's stdin
 POINTS = {
     'archive_format': 10,          # Deduct if archive is not .tgz/.tar.gz or .zip
     'filename_correct': 10,        # Deduct if expected filenames are not exactly present
@@ -34,49 +71,170 @@ POINTS = {
 }
 TOTAL_POINTS = 100
 
+# coreutils' stdbuf preload library; loading it directly saves exec'ing stdbuf for every run
+STDBUF_LIBRARY_PATHS = [
+    '/usr/libexec/coreutils/libstdbuf.so',                 # RHEL / Rocky / Fedora
+    '/usr/lib/x86_64-linux-gnu/coreutils/libstdbuf.so',    # Debian / Ubuntu
+    '/usr/lib/coreutils/libstdbuf.so',
+]
+STDBUF_LIBRARY = next((path for path in STDBUF_LIBRARY_PATHS if os.path.exists(path)), None)
+
+# Student programs started for the submission this worker is grading, so a timeout can stop them
+STARTED_PROGRAMS = []
+
 # Example seeds (if needed)
 SEED_A = "12345"  # For ex4a* programs
 SEED_B = "67890"  # For ex4b* programs
 
 ### Logging Setup ###
 def setup_logging():
+    """
+    Sends every record through a queue to one listener thread in the main process, which
+    owns the file and console handlers. Pool workers inherit the queue handler and never
+    write the log file themselves. Returns the started listener; stop it when grading ends.
+    """
     os.makedirs(LOGS_DIR, exist_ok=True)
     log_filename = os.path.join(LOGS_DIR, f'grading_ex4_{datetime.now().strftime("%Y%m%d_%H%M%S")}.log')
     logger = logging.getLogger()
     logger.setLevel(logging.INFO)
     file_handler = logging.FileHandler(log_filename)
     console_handler = logging.StreamHandler()
-    file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    # Records come from every pool worker, so each line carries the worker PID
+    file_formatter = logging.Formatter('%(asctime)s - %(process)d - %(levelname)s - %(message)s')
     console_formatter = logging.Formatter('%(levelname)s - %(message)s')
     file_handler.setFormatter(file_formatter)
     console_handler.setFormatter(console_formatter)
-    if not logger.hasHandlers():
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+    log_queue = multiprocessing.Queue(-1)
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler)
+    listener.start()
+    return listener
 
 ### Archive Extraction ###
+def member_destination(extract_to, member_name, is_dir=False):
+    """
+    Returns where an archive member should be written, or None if its name is absolute
+    or climbs out of the extraction folder (e.g. '../../etc/passwd'). A folder member may
+    be the extraction folder itself, like the './' entry of an archive made with 'tar czf x.tgz .'.
+    """
+    root = os.path.realpath(extract_to)
+    destination = os.path.realpath(os.path.join(root, member_name))
+    if os.path.isabs(member_name):
+        return None
+    if not destination.startswith(root + os.sep) and not (is_dir and destination == root):
+        return None
+    return destination
+
+def copy_member(source, destination, buffer, created_dirs):
+    """
+    Copies one member's data through the shared buffer, creating parent folders once per run.
+    """
+    parent = os.path.dirname(destination)
+    if parent not in created_dirs:
+        os.makedirs(parent, exist_ok=True)
+        created_dirs.add(parent)
+    view = memoryview(buffer)
+    with open(destination, 'wb', buffering=0) as out_f:
+        while True:
+            count = source.readinto(view)
+            if not count:
+                break
+            out_f.write(view[:count])
+
+def extract_members(archive_path, extract_to):
+    """
+    Extracts regular files and folders member by member with one reusable 1 MiB buffer,
+    skipping unsafe paths and special members (links, devices) that extractall would create.
+    """
+    buffer = bytearray(EXTRACT_BUFFER_SIZE)
+    created_dirs = set()
+    if archive_path.endswith(TAR_EXTS):
+        with tarfile.open(archive_path, 'r:gz') as tar_ref:
+            for member in tar_ref:
+                destination = member_destination(extract_to, member.name, member.isdir())
+                if destination is None:
+                    logging.warning(f"Skipping unsafe archive member: {member.name}")
+                elif member.isdir():
+                    os.makedirs(destination, exist_ok=True)
+                    created_dirs.add(destination)
+                elif member.isfile():
+                    # Passing the TarInfo itself avoids a by-name lookup over all members
+                    with tar_ref.extractfile(member) as source:
+                        copy_member(source, destination, buffer, created_dirs)
+                    os.chmod(destination, member.mode & 0o777)
+    else:
+        with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+            for info in zip_ref.infolist():
+                destination = member_destination(extract_to, info.filename, info.filename.endswith('/'))
+                if destination is None:
+                    logging.warning(f"Skipping unsafe archive member: {info.filename}")
+                elif info.filename.endswith('/'):
+                    os.makedirs(destination, exist_ok=True)
+                    created_dirs.add(destination)
+                else:
+                    with zip_ref.open(info) as source:
+                        copy_member(source, destination, buffer, created_dirs)
+
 def extract_archive(archive_path, extract_to):
     try:
-        if archive_path.endswith(('.tgz', '.tar.gz')):
-            with tarfile.open(archive_path, 'r:gz') as tar_ref:
-                tar_ref.extractall(extract_to)
+        if archive_path.endswith(TAR_EXTS):
+            extract_members(archive_path, extract_to)
             archive_type = "TGZ"
         elif archive_path.endswith('.zip'):
-            with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                zip_ref.extractall(extract_to)
+            extract_members(archive_path, extract_to)
             archive_type = "ZIP"
         else:
             archive_type = "Unsupported"
             raise ValueError("Unsupported archive format.")
-        files = os.listdir(extract_to)
-        logging.info(f"Extracted files: {files}")
         return True, archive_type
     except Exception as e:
         logging.error(f"Failed to extract {archive_path}: {e}", exc_info=True)
         return False, str(e)
 
+### Result Cache ###
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def result_cache_path(submission_folder, archive_path):
+    """
+    Keys a graded result by the folder name (it holds the student's name and ID),
+    the archive contents and this grader script, so editing the grader invalidates every entry.
+    """
+    key_parts = [submission_folder, file_sha256(archive_path), file_sha256(os.path.abspath(__file__))]
+    key = hashlib.sha256('\0'.join(key_parts).encode('utf-8')).hexdigest()
+    return os.path.join(RESULT_CACHE_DIR, f"{key}.json")
+
+def load_cached_result(cache_path):
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def store_cached_result(cache_path, log_entry):
+    try:
+        os.makedirs(RESULT_CACHE_DIR, exist_ok=True)
+        fd, staging_path = tempfile.mkstemp(dir=RESULT_CACHE_DIR)
+        with open(fd, 'w', encoding='utf-8') as f:
+            json.dump(log_entry, f, ensure_ascii=False)
+        os.replace(staging_path, cache_path)
+    except OSError as e:
+        logging.warning(f"Could not cache result in {cache_path}: {e}")
+
+### Directory Snapshot ###
+def scan_entries(path):
+    """
+    Takes one os.scandir snapshot of a folder as {name: DirEntry}, shared by all checks.
+    """
+    with os.scandir(path) as it:
+        return {entry.name: entry for entry in it}
+
 ### Filename Verification ###
-def verify_files(submission_path):
+def verify_files(entries):
     expected = {
         'ex4a1.c': 'ex4a1',
         'ex4a2.c': 'ex4a2',
@@ -86,12 +244,11 @@ def verify_files(submission_path):
         'ex4c2.c': 'ex4c2',
         'ex4c3.c': 'ex4c3'
     }
-    found_files = os.listdir(submission_path)
-    c_files = [f for f in found_files if f.endswith('.c')]
+    c_files = [f for f in entries if f.endswith('.c')]
     missing = []
     wrong = []
     for exp in expected:
-        if exp not in found_files:
+        if exp not in entries:
             alternatives = [f for f in c_files if f.lower().replace(" ", "") == exp.lower().replace(" ", "")]
             if not alternatives:
                 missing.append(exp)
@@ -100,8 +257,8 @@ def verify_files(submission_path):
     return missing, wrong
 
 ### Check README Extension & Extract First 10 Lines ###
-def check_readme_extension(submission_path):
-    readme_files = [f for f in os.listdir(submission_path) if re.match(r'^readme(\.txt)?$', f, re.IGNORECASE)]
+def check_readme_extension(entries):
+    readme_files = [f for f in entries if README_RE.match(f)]
     if not readme_files:
         logging.warning("README file not found.")
         return False, None
@@ -111,38 +268,182 @@ def check_readme_extension(submission_path):
         logging.warning("README file has .txt extension.")
     return has_txt, readme_file
 
+def read_first_lines(file_path, count=10):
+    """
+    Reads the head of a file, usually in one call, and returns its first lines, stripped.
+    Missing lines are returned as empty strings, as readline() would give at end of file.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read(HEADER_READ_SIZE)
+        # Very long lines: keep reading until the lines are complete, as readline() would
+        while data.count(b'\n') < count:
+            more = f.read(HEADER_READ_SIZE)
+            if not more:
+                break
+            data += more
+    lines = [line.decode('utf-8', 'replace').strip() for line in data.splitlines()[:count]]
+    return lines + [''] * (count - len(lines))
+
 def extract_readme(submission_path, readme_file):
     readme_path = os.path.join(submission_path, readme_file)
     try:
-        with open(readme_path, 'r', encoding='utf-8') as f:
-            lines = [f.readline().strip() for _ in range(10)]
+        lines = read_first_lines(readme_path)
         logging.info(f"Extracted first 10 lines of README from {readme_file}.")
         return lines
     except Exception as e:
         logging.error(f"Failed to read README file {readme_file}: {e}", exc_info=True)
         return []
 
+### Compilation Memo ###
+MEMO_CONNECTION = None  # this worker's memo connection, opened on first use
+MEMO_LOCK = threading.Lock()  # the compile threads of a submission share the connection
+
+def memo_connection():
+    """
+    Returns this worker's memo connection, opening it and creating the table on first use.
+    Callers hold MEMO_LOCK.
+    """
+    global MEMO_CONNECTION
+    if MEMO_CONNECTION is None:
+        os.makedirs(SUMMARY_DIR, exist_ok=True)
+        conn = sqlite3.connect(MEMO_DB, timeout=30, check_same_thread=False)
+        conn.execute('CREATE TABLE IF NOT EXISTS memo (key TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL)')
+        MEMO_CONNECTION = conn
+    return MEMO_CONNECTION
+
+def memo_key(fn_name, submission_path, file_names, args):
+    """
+    Hashes the function name, its arguments and the contents of the files it depends on.
+    """
+    digest = hashlib.sha256('\0'.join([fn_name] + [str(arg) for arg in args]).encode('utf-8'))
+    for name in file_names:
+        digest.update(b'\0' + name.encode('utf-8') + b'\0')
+        digest.update(file_sha256(os.path.join(submission_path, name)).encode('ascii'))
+    return digest.hexdigest()
+
+def memo_get(key):
+    """
+    Returns the memoized value for key, or None. A broken memo only ever means a miss.
+    """
+    try:
+        with MEMO_LOCK:
+            conn = memo_connection()
+            with conn:
+                row = conn.execute('SELECT value FROM memo WHERE key = ?', (key,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute('UPDATE memo SET last_used = ? WHERE key = ?', (time.time(), key))
+                return json.loads(row[0])
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logging.warning(f"Could not read compilation memo: {e}")
+        return None
+
+def memo_put(key, value):
+    """
+    Stores value under key and drops the least recently used entries beyond MEMO_MAX_ENTRIES.
+    A memo that cannot be written is skipped.
+    """
+    try:
+        with MEMO_LOCK:
+            conn = memo_connection()
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO memo (key, value, last_used) VALUES (?, ?, ?)',
+                             (key, json.dumps(value), time.time()))
+                stale = conn.execute('SELECT key FROM memo ORDER BY last_used DESC LIMIT -1 OFFSET ?',
+                                     (MEMO_MAX_ENTRIES,)).fetchall()
+                conn.executemany('DELETE FROM memo WHERE key = ?', stale)
+    except (sqlite3.Error, OSError) as e:
+        logging.warning(f"Could not write compilation memo: {e}")
+        return
+    for (stale_key,) in stale:
+        try:
+            os.unlink(os.path.join(BUILD_CACHE_DIR, stale_key))
+        except OSError:
+            pass
+
+def gcc_version():
+    """
+    Identifies the installed compiler, so a compiler upgrade invalidates memoized builds.
+    """
+    try:
+        return subprocess.check_output([GCC_PATH, '--version'], stderr=subprocess.DEVNULL).decode('utf-8', 'replace')
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+GCC_VERSION = gcc_version()
+
+### Build Cache ###
+def restore_binary(key, executable_path):
+    """
+    Copies the executable built earlier for the same memo key into place, e.g. for a
+    duplicate submission. Returns False when it is not in the build cache.
+    A copy rather than a hard link: re-extracting an archive that ships its own binary
+    would otherwise overwrite the cached file through the shared inode.
+    """
+    try:
+        shutil.copyfile(os.path.join(BUILD_CACHE_DIR, key), executable_path)
+        os.chmod(executable_path, 0o755)
+    except OSError:
+        return False
+    return True
+
+def store_binary(key, executable_path):
+    try:
+        os.makedirs(BUILD_CACHE_DIR, exist_ok=True)
+        fd, staging_path = tempfile.mkstemp(dir=BUILD_CACHE_DIR)
+        with open(fd, 'wb') as dst, open(executable_path, 'rb') as src:
+            shutil.copyfileobj(src, dst)
+        os.replace(staging_path, os.path.join(BUILD_CACHE_DIR, key))
+    except OSError as e:
+        logging.warning(f"Could not add {executable_path} to the build cache: {e}")
+
 ### Compilation ###
-def compile_source(submission_path, source_file, output_executable):
-    compile_cmd = [GCC_COMMAND, '-Wall', '-o', output_executable, source_file]
+def compile_source(submission_path, entries, source_file, output_executable):
+    """
+    Compiles one source file, taking the headers it may include from the folder's entries.
+    gcc is skipped when the memo holds a result for the same source, headers and compiler:
+    the executable is reused when it is still next to the source, or copied from the build
+    cache when another submission produced it.
+    """
+    compile_cmd = [GCC_PATH] + GCC_FLAGS + ['-o', output_executable, source_file]
+    executable_path = os.path.join(submission_path, output_executable)
     try:
-        result = subprocess.run(
-            compile_cmd,
-            cwd=submission_path,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-            timeout=TIMEOUT_EXECUTION
-        )
-        if result.returncode != 0:
-            logging.error(f"Compilation failed for {source_file}: {result.stderr.strip()}")
-            return False, result.stderr.strip()
+        headers = sorted(f for f in entries if f.endswith('.h'))
+        key = memo_key('compile_source', submission_path, [source_file] + headers, compile_cmd + [GCC_VERSION])
+        cached = memo_get(key)
+        if cached is not None and (cached['returncode'] != 0 or (
+                os.path.exists(executable_path) and file_sha256(executable_path) == cached['executable_sha256'])
+                or restore_binary(key, executable_path)):
+            logging.info(f"Using memoized compilation result for {source_file}.")
+            returncode, compile_stderr = cached['returncode'], cached['stderr']
+        else:
+            result = subprocess.run(
+                compile_cmd,
+                cwd=submission_path,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                timeout=TIMEOUT_EXECUTION
+            )
+            returncode, compile_stderr = result.returncode, result.stderr.decode('utf-8', 'replace').strip()
+            if returncode == 0:
+                store_binary(key, executable_path)
+            memo_put(key, {
+                'returncode': returncode,
+                'stderr': compile_stderr,
+                'executable_sha256': file_sha256(executable_path) if returncode == 0 else None
+            })
+        if returncode != 0:
+            logging.error(f"Compilation failed for {source_file}: {compile_stderr}")
+            return False, compile_stderr
         else:
-            if result.stderr.strip():
-                logging.warning(f"Compilation warnings for {source_file}: {result.stderr.strip()}")
+            # gcc already produces an executable file; only repair the mode if it did not
+            if not os.access(executable_path, os.X_OK):
+                os.chmod(executable_path, 0o755)
+            if compile_stderr:
+                logging.warning(f"Compilation warnings for {source_file}: {compile_stderr}")
             else:
                 logging.info(f"Compilation succeeded for {source_file} with no warnings.")
-            return True, result.stderr.strip()
+            return True, compile_stderr
     except subprocess.TimeoutExpired:
         logging.error(f"Compilation timed out for {source_file}.")
         return False, "Compilation timed out."
@@ -150,51 +451,158 @@ def compile_source(submission_path, source_file, output_executable):
         logging.error(f"Compilation error for {source_file}: {e}", exc_info=True)
         return False, str(e)
 
-### Generic Run Program Function ###
-def run_program(submission_path, executable, arg_list, output_filename, queue):
+### Unbuffered Program Environment ###
+def unbuffered_env():
+    """
+    Environment that makes a student program's stdout unbuffered, exactly as 'stdbuf -o0' does,
+    so output printed before the program is interrupted with SIGINT is not lost.
+    Returns None (inherit the environment) when the library is not installed.
+    """
+    if STDBUF_LIBRARY is None:
+        return None
+    env = dict(os.environ)
+    preload = env.get('LD_PRELOAD')
+    env['LD_PRELOAD'] = f"{STDBUF_LIBRARY}:{preload}" if preload else STDBUF_LIBRARY
+    env['_STDBUF_O'] = '0'
+    return env
+
+### Readiness Checks ###
+def wait_for(predicate, timeout=READY_TIMEOUT, interval=READY_POLL_INTERVAL):
+    """
+    Polls predicate until it is true or the timeout passes, replacing fixed sleeps
+    between dependent programs. Returns whether the predicate became true.
+    """
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(interval)
+    return True
+
+def program_waiting(launch):
     """
-    Runs a program with a list of arguments using unbuffered output.
-    Output is redirected to a file which is then read and returned via the queue.
+    True once a started program has exited or is asleep in the kernel (state 'S' in
+    /proc/<pid>/stat), e.g. blocked opening a FIFO, in msgrcv() or waiting for a client.
     """
+    proc = launch[0]
+    if proc is None or proc.poll() is not None:
+        return True
     try:
-        executable_path = os.path.join(submission_path, executable)
-        output_file = os.path.join(submission_path, output_filename)
-        os.chmod(executable_path, 0o755)
-        # Build command with stdbuf for unbuffered output.
-        cmd = ["stdbuf", "-o0", f"./{executable}"] + [str(arg) for arg in arg_list]
+        with open(f'/proc/{proc.pid}/stat', 'r') as f:
+            state = f.read().rsplit(')', 1)[1].split()[0]
+    except (OSError, IndexError):
+        return False
+    return state == 'S'
+
+def read_available(pipe, buffer):
+    """
+    Appends whatever a non-blocking pipe has ready to buffer, without waiting for more.
+    """
+    while True:
+        try:
+            chunk = os.read(pipe.fileno(), 4096)
+        except BlockingIOError:
+            return
+        if not chunk:
+            return
+        buffer.extend(chunk)
+
+### Generic Run Program Functions ###
+def start_program(submission_path, executable, arg_list):
+    """
+    Starts a program in its own session using unbuffered output, with stdout and stderr
+    captured in an unlinked temporary file on tmpfs, so a program printing a lot never blocks on
+    a full pipe. The file is capped at LIMIT_FILE_SIZE, so a print loop cannot fill the tmpfs.
+    Returns (Popen, output_file, None), or (None, None, error) when it cannot be started.
+    """
+    executable_path = os.path.join(submission_path, executable)
+    output_file = tempfile.TemporaryFile(dir=SPOOL_DIR)
+    try:
+        # Unbuffered output comes from the environment, not a stdbuf wrapper process.
+        # No preexec_fn is passed anywhere: that keeps CPython 3.10+ on its vfork() fast path.
+        # posix_spawn is not used since subprocess only picks it without cwd/start_new_session.
+        cmd = [f"./{executable}"] + [str(arg) for arg in arg_list]
         logging.info(f"Running command: {' '.join(cmd)} in {submission_path}")
-        with open(output_file, 'w') as out_f:
-            proc = subprocess.run(
-                cmd,
-                cwd=submission_path,
-                stdin=subprocess.DEVNULL,
-                stdout=out_f,
-                stderr=out_f,
-                universal_newlines=True,
-                timeout=TIMEOUT_EXECUTION
-            )
-        with open(output_file, 'r') as out_f:
-            captured = out_f.read()
-        exit_code = proc.returncode
-        message = f"{executable} Output:\n{captured.strip()}\nExit Code: {exit_code}"
-        queue.put(message)
+        proc = subprocess.Popen(
+            cmd,
+            executable=executable_path,
+            cwd=submission_path,
+            stdin=subprocess.DEVNULL,
+            stdout=output_file,
+            stderr=subprocess.STDOUT,
+            env=unbuffered_env(),
+            start_new_session=True
+        )
+    except OSError as e:
+        logging.error(f"Error running {executable}: {e}")
+        output_file.close()
+        return None, None, f"Execution Error: {e}"
+    STARTED_PROGRAMS.append(proc)
+    limit_file_size(proc.pid)
+    return proc, output_file, None
+
+def limit_file_size(pid):
+    """
+    Caps the size of any file a started program writes with prlimit, which needs no preexec_fn.
+    A program writing past it is killed by SIGXFSZ.
+    """
+    try:
+        resource.prlimit(pid, resource.RLIMIT_FSIZE, (LIMIT_FILE_SIZE, LIMIT_FILE_SIZE))
+    except ProcessLookupError:
+        pass  # the program already exited
+
+def kill_program(proc):
+    """
+    Kills a program's whole session, including anything it forked that is still running
+    after the program itself exited, and reaps the program.
+    """
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    proc.wait()
+
+def collect_output(executable, launch, timeout=TIMEOUT_EXECUTION, timeout_message="Execution Timeout"):
+    """
+    Waits for a program started by start_program to exit and returns its captured output
+    message, keeping at most OUTPUT_LIMIT bytes. Completion is the program's own exit, not the
+    end of its output, so a child it left running cannot hold the grader up; that child is
+    killed with the session. A program still running after the timeout is killed and
+    timeout_message is returned.
+    """
+    proc, output_file, error = launch
+    if error:
+        return error
+    with output_file:
         try:
-            os.remove(output_file)
-        except Exception as e:
-            logging.warning(f"Could not remove output file {output_file}: {e}")
-    except subprocess.TimeoutExpired:
-        logging.error(f"{executable} execution timed out.")
-        queue.put("Execution Timeout")
-    except Exception as e:
-        logging.error(f"Error running {executable}: {e}", exc_info=True)
-        queue.put(f"Execution Error: {e}")
+            proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logging.error(f"{executable} did not exit within {timeout} seconds.")
+            kill_program(proc)
+            return timeout_message
+        kill_program(proc)
+        output_file.seek(0)
+        output = output_file.read(OUTPUT_LIMIT)
+    captured = output.decode('utf-8', 'replace')
+    return f"{executable} Output:\n{captured.strip()}\nExit Code: {proc.returncode}"
+
+def collect_outputs(programs, log_entry, timeout=TIMEOUT_EXECUTION):
+    """
+    Collects the outputs of programs that run together. They share one deadline, so a hung
+    group costs at most timeout seconds in total instead of timeout seconds per program.
+    """
+    deadline = time.monotonic() + timeout
+    for launch, exe, label in programs:
+        remaining = max(deadline - time.monotonic(), COLLECT_GRACE)
+        res = collect_output(exe, launch, timeout=remaining)
+        log_entry["Execution Outputs"][label] = res
+        logging.info(f"{label} Output:\n{res}")
 
 ### Comments Checker ###
 def check_comments(submission_path, source_file):
     source_path = os.path.join(submission_path, source_file)
     try:
-        with open(source_path, 'r', encoding='utf-8') as f:
-            lines = [f.readline().strip() for _ in range(10)]
+        lines = read_first_lines(source_path)
         comments_present = any(line.startswith("//") or "/*" in line for line in lines if line)
         return comments_present, lines
     except Exception as e:
@@ -202,8 +610,11 @@ def check_comments(submission_path, source_file):
         return False, []
 
 ### Process a Single Submission ###
-def process_submission(submission_folder):
-    log_entry = {
+def new_log_entry(submission_folder):
+    """
+    Returns the summary entry every submission starts from, so all entries share one set of keys.
+    """
+    return {
         "Student ID": "",
         "Student Name": "",
         "Submission Folder": submission_folder,
@@ -220,11 +631,14 @@ def process_submission(submission_folder):
         "Points Deducted": 0,
         "Final Score": TOTAL_POINTS
     }
+
+def process_submission(submission_folder):
+    log_entry = new_log_entry(submission_folder)
     deductions = 0
     submission_path = os.path.join(SUBMISSIONS_DIR, submission_folder)
     
     # Extract student info
-    match = re.match(r'^(.*?)_(\d+)_assignsubmission_file$', submission_folder)
+    match = FOLDER_RE.match(submission_folder)
     if match:
         log_entry["Student Name"] = match.group(1).strip()
         log_entry["Student ID"] = match.group(2).strip()
@@ -233,13 +647,21 @@ def process_submission(submission_folder):
         deductions += 5
     
     # Extract archive
-    archives = [f for f in os.listdir(submission_path) if f.endswith(('.tgz', '.tar.gz', '.zip'))]
+    archives = [f for f in scan_entries(submission_path) if f.endswith(ARCHIVE_EXTS)]
     if not archives:
         log_entry["Issues"].append("No supported archive found.")
         deductions += POINTS['archive_format']
         log_entry["Points Deducted"] += POINTS['archive_format']
         return log_entry
     archive_file = os.path.join(submission_path, archives[0])
+
+    # Unchanged archive graded by this same grader: reuse the earlier result
+    cache_path = result_cache_path(submission_folder, archive_file)
+    cached_entry = load_cached_result(cache_path)
+    if cached_entry is not None:
+        logging.info(f"Using cached result for {submission_folder}.")
+        return cached_entry
+
     success, arch_type = extract_archive(archive_file, submission_path)
     if success:
         log_entry["Archive Type"] = arch_type
@@ -253,8 +675,12 @@ def process_submission(submission_folder):
         log_entry["Points Deducted"] += POINTS['archive_format']
         return log_entry
 
+    # Snapshot the extracted files once; the checks below test membership against it
+    entries = scan_entries(submission_path)
+    logging.info(f"Extracted files: {list(entries)}")
+
     # Verify files
-    missing_files, wrong_files = verify_files(submission_path)
+    missing_files, wrong_files = verify_files(entries)
     if missing_files:
         log_entry["Missing Files"] = missing_files
         deductions += 10 * len(missing_files)
@@ -265,7 +691,7 @@ def process_submission(submission_folder):
         log_entry["Points Deducted"] += 10 * len(wrong_files)
     
     # Process README
-    has_txt, readme_filename = check_readme_extension(submission_path)
+    has_txt, readme_filename = check_readme_extension(entries)
     if not readme_filename:
         log_entry["Issues"].append("README file missing.")
         deductions += POINTS['readme_txt_extension']
@@ -287,10 +713,19 @@ def process_submission(submission_folder):
         "ex4c2.c": "ex4c2",
         "ex4c3.c": "ex4c3"
     }
+    # The sources are independent, so gcc runs for all of them at once; the work happens
+    # in the gcc processes, so threads are enough. Results are recorded in source order below.
+    present_sources = {src: exe for src, exe in expected_sources.items() if src in entries}
+    compile_results = {}
+    if present_sources:
+        with ThreadPoolExecutor(max_workers=len(present_sources)) as pool:
+            futures = {pool.submit(compile_source, submission_path, entries, src, exe): src
+                       for src, exe in present_sources.items()}
+            for future in as_completed(futures):
+                compile_results[futures[future]] = future.result()
     for src, exe in expected_sources.items():
-        src_path = os.path.join(submission_path, src)
-        if os.path.exists(src_path):
-            comp_ok, comp_msg = compile_source(submission_path, src, exe)
+        if src in compile_results:
+            comp_ok, comp_msg = compile_results[src]
             log_entry["Compilation"][src] = comp_ok
             log_entry["Compilation Warnings"][src] = comp_msg
             if not comp_ok:
@@ -307,8 +742,7 @@ def process_submission(submission_folder):
     
     # Check for comments in source files
     for src in expected_sources:
-        src_path = os.path.join(submission_path, src)
-        if os.path.exists(src_path):
+        if src in entries:
             comments, _ = check_comments(submission_path, src)
             log_entry["Comments Present"][src] = comments
         else:
@@ -319,81 +753,61 @@ def process_submission(submission_folder):
         log_entry["Points Deducted"] += POINTS['comments_missing']
 
     ### Execution Phase – Concurrent Runs ###
-    # --- Helper to start a process ---
-    def start_proc(label, exe, arg_list, out_filename, submission_path):
-        q = Queue()
-        arg_list_str = [str(arg) for arg in arg_list]
-        # Use stdbuf for unbuffered output.
-        p = Process(target=run_program, args=(submission_path, exe, arg_list_str, out_filename, q))
-        p.start()
-        return p, q
+    # Every program runs in its own session, so signals sent to it never reach the grader.
 
     # --- Program A (Named Pipes) ---
-    p_a_mgr, q_a_mgr = start_proc("Program A Manager", "ex4a1", ["fifom", "fifo0", "fifo1"], "ex4a1_output.txt", submission_path)
-    time.sleep(2)  # Give manager time to set up.
-    p_a_part0, q_a_part0 = start_proc("Program A Participant 0", "ex4a2", ["fifom", "0", "17"], "ex4a2_0_output.txt", submission_path)
-    p_a_part1, q_a_part1 = start_proc("Program A Participant 1", "ex4a2", ["fifom", "1", "18"], "ex4a2_1_output.txt", submission_path)
-    for proc, q, label in [(p_a_mgr, q_a_mgr, "Program A Manager"),
-                           (p_a_part0, q_a_part0, "Program A Participant 0"),
-                           (p_a_part1, q_a_part1, "Program A Participant 1")]:
-        proc.join(timeout=TIMEOUT_EXECUTION + 10)
-        if proc.is_alive():
-            proc.terminate()
-            log_entry["Execution Outputs"][label] = "Execution timed out."
-            q.put("Execution timed out.")
-        try:
-            res = q.get_nowait()
-        except Exception:
-            res = "No Output"
-        log_entry["Execution Outputs"][label] = res
-        logging.info(f"{label} Output:\n{res}")
+    a_mgr = start_program(submission_path, "ex4a1", ["fifom", "fifo0", "fifo1"])
+    # Give manager time to set up: its FIFOs exist and it is blocked waiting on them.
+    wait_for(lambda: program_waiting(a_mgr) and all(
+        os.path.exists(os.path.join(submission_path, fifo)) for fifo in ("fifom", "fifo0", "fifo1")))
+    a_part0 = start_program(submission_path, "ex4a2", ["fifom", "0", "17"])
+    a_part1 = start_program(submission_path, "ex4a2", ["fifom", "1", "18"])
+    collect_outputs([(a_mgr, "ex4a1", "Program A Manager"),
+                     (a_part0, "ex4a2", "Program A Participant 0"),
+                     (a_part1, "ex4a2", "Program A Participant 1")], log_entry)
 
     # --- Program B (Message Queues) ---
-    p_b_mgr, q_b_mgr = start_proc("Program B Manager", "ex4b1", [], "ex4b1_output.txt", submission_path)
-    time.sleep(2)
-    p_b_part0, q_b_part0 = start_proc("Program B Participant 0", "ex4b2", ["0", "17"], "ex4b2_0_output.txt", submission_path)
-    p_b_part1, q_b_part1 = start_proc("Program B Participant 1", "ex4b2", ["1", "18"], "ex4b2_1_output.txt", submission_path)
-    for proc, q, label in [(p_b_mgr, q_b_mgr, "Program B Manager"),
-                           (p_b_part0, q_b_part0, "Program B Participant 0"),
-                           (p_b_part1, q_b_part1, "Program B Participant 1")]:
-        proc.join(timeout=TIMEOUT_EXECUTION + 10)
-        if proc.is_alive():
-            proc.terminate()
-            log_entry["Execution Outputs"][label] = "Execution timed out."
-            q.put("Execution timed out.")
-        try:
-            res = q.get_nowait()
-        except Exception:
-            res = "No Output"
-        log_entry["Execution Outputs"][label] = res
-        logging.info(f"{label} Output:\n{res}")
+    b_mgr = start_program(submission_path, "ex4b1", [])
+    wait_for(lambda: program_waiting(b_mgr))  # blocked on its message queue
+    b_part0 = start_program(submission_path, "ex4b2", ["0", "17"])
+    b_part1 = start_program(submission_path, "ex4b2", ["1", "18"])
+    collect_outputs([(b_mgr, "ex4b1", "Program B Manager"),
+                     (b_part0, "ex4b2", "Program B Participant 0"),
+                     (b_part1, "ex4b2", "Program B Participant 1")], log_entry)
 
     # --- Program C (Servers and Frontend) ---
     # Start the two server processes concurrently.
-    p_c_server1, q_c_server1 = start_proc("Program C Prime Server", "ex4c1", [], "ex4c1_output.txt", submission_path)
-    p_c_server2, q_c_server2 = start_proc("Program C Arithmetic Server", "ex4c2", [], "ex4c2_output.txt", submission_path)
-    time.sleep(2)
-    # Create a temporary input file for the frontend.
-    temp_input_file = os.path.join(submission_path, "ex4c3_test_input.txt")
-    with open(temp_input_file, 'w') as finp:
-        finp.write("p\n2 3897 100 17 0\n" + "a\n3879 + 17\n")
-    # Launch the Frontend (ex4c3) with STDIN redirected from the temporary file.
+    c_server1 = start_program(submission_path, "ex4c1", [])
+    c_server2 = start_program(submission_path, "ex4c2", [])
+    wait_for(lambda: program_waiting(c_server1) and program_waiting(c_server2))  # both waiting for clients
+    # Launch the Frontend (ex4c3), feeding its input through a pipe.
     try:
-        output_file = os.path.join(submission_path, "ex4c3_output.txt")
-        cmd = ["stdbuf", "-o0", "./ex4c3"]
-        logging.info(f"Running command: {' '.join(cmd)} in {submission_path} with input from file")
-        with open(temp_input_file, 'r') as fin, open(output_file, 'w') as fout:
-            p_c_frontend = subprocess.Popen(
-                cmd,
-                cwd=submission_path,
-                stdin=fin,
-                stdout=fout,
-                stderr=subprocess.STDOUT,
-                universal_newlines=True,
-                start_new_session=True
-            )
-        # Allow the frontend to run briefly (2 seconds) to read the input.
-        time.sleep(2)
+        cmd = ["./ex4c3"]
+        logging.info(f"Running command: {' '.join(cmd)} in {submission_path} with piped input")
+        p_c_frontend = subprocess.Popen(
+            cmd,
+            cwd=submission_path,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            env=unbuffered_env(),
+            start_new_session=True
+        )
+        STARTED_PROGRAMS.append(p_c_frontend)
+        try:
+            p_c_frontend.stdin.write(FRONTEND_INPUT)
+            p_c_frontend.stdin.close()
+        except BrokenPipeError:
+            logging.warning("Program C Frontend exited before reading all of its input.")
+        os.set_blocking(p_c_frontend.stdout.fileno(), False)
+        frontend_output = bytearray()
+
+        def frontend_done():
+            read_available(p_c_frontend.stdout, frontend_output)
+            return p_c_frontend.poll() is not None or frontend_output.count(b'\n') >= 2
+
+        # Allow the frontend to run briefly (at most 2 seconds) until the two lines we keep are out.
+        wait_for(frontend_done)
         # Terminate the frontend immediately.
         try:
             os.killpg(os.getpgid(p_c_frontend.pid), signal.SIGINT)
@@ -404,94 +818,150 @@ def process_submission(submission_folder):
             p_c_frontend.wait(timeout=5)
         except Exception:
             p_c_frontend.terminate()
-        # Read only the first two lines of the output.
-        with open(output_file, 'r') as fout:
-            frontend_lines = []
-            for _ in range(2):
-                line = fout.readline()
-                if not line:
-                    break
-                frontend_lines.append(line.strip())
+        read_available(p_c_frontend.stdout, frontend_output)
+        p_c_frontend.stdout.close()
+        # Keep only the first two lines of the output.
+        frontend_lines = [line.decode('utf-8', 'replace').strip() for line in bytes(frontend_output).splitlines()[:2]]
         frontend_summary = "\n".join(frontend_lines)
         log_entry["Execution Outputs"]["Program C Frontend"] = f"ex4c3 Output (first 2 lines):\n{frontend_summary}"
         logging.info(f"Program C Frontend Output (first 2 lines):\n{frontend_summary}")
     except Exception as e:
         logging.error(f"Error running Program C Frontend: {e}", exc_info=True)
         log_entry["Execution Outputs"]["Program C Frontend"] = f"Execution Error: {e}"
-    finally:
-        try:
-            os.remove(temp_input_file)
-        except Exception as e:
-            logging.warning(f"Could not remove temporary input file {temp_input_file}: {e}")
 
     # --- Termination Phase for Program C – Servers ---
-    def terminate_process(proc, label, q):
-        try:
-            os.killpg(os.getpgid(proc.pid), signal.SIGINT)
-            logging.info(f"Sent SIGINT to {label} (PID: {proc.pid})")
-        except Exception as e:
-            logging.error(f"Failed to send SIGINT to {label}: {e}", exc_info=True)
-        try:
-            proc.join(timeout=5)
-        except Exception:
-            proc.terminate()
-        try:
-            q.put("Terminated after test.")
-        except Exception:
-            pass
-        logging.info(f"{label} terminated after test.")
-    for label, proc, q in [
-            ("Program C Prime Server", p_c_server1, q_c_server1),
-            ("Program C Arithmetic Server", p_c_server2, q_c_server2)
-        ]:
-        terminate_process(proc, label, q)
-        try:
-            res = q.get_nowait()
-        except Exception:
-            res = "No Output"
+    for launch, exe, label in [(c_server1, "ex4c1", "Program C Prime Server"),
+                               (c_server2, "ex4c2", "Program C Arithmetic Server")]:
+        proc = launch[0]
+        if proc is not None:
+            try:
+                os.killpg(proc.pid, signal.SIGINT)
+                logging.info(f"Sent SIGINT to {label} (PID: {proc.pid})")
+            except OSError as e:
+                logging.error(f"Failed to send SIGINT to {label}: {e}")
+        res = collect_output(exe, launch, timeout=5, timeout_message="Terminated after test.")
         log_entry["Execution Outputs"][label] = res
         logging.info(f"{label} Output:\n{res}")
 
     # Set final score.
     log_entry["Points Deducted"] = deductions
     log_entry["Final Score"] = max(TOTAL_POINTS - deductions, 0)
+    store_cached_result(cache_path, log_entry)
     return log_entry
 
+### Parallel Grading Worker ###
+class SubmissionTimeout(BaseException):
+    """
+    Raised by SIGALRM when a submission runs past TIMEOUT_SUBMISSION.
+    Derives from BaseException so the 'except Exception' blocks in process_submission let it through.
+    """
+
+def handle_submission_timeout(signum, frame):
+    raise SubmissionTimeout()
+
+def grade_submission(submission_folder):
+    """
+    Pool entry point wrapping process_submission with a TIMEOUT_SUBMISSION budget.
+    Any student program still running afterwards is killed, so none outlives its submission.
+    """
+    signal.signal(signal.SIGALRM, handle_submission_timeout)
+    signal.alarm(TIMEOUT_SUBMISSION)
+    try:
+        return process_submission(submission_folder)
+    except SubmissionTimeout:
+        logging.error(f"Grading {submission_folder} timed out after {TIMEOUT_SUBMISSION} seconds.")
+        log_entry = new_log_entry(submission_folder)
+        match = FOLDER_RE.match(submission_folder)
+        if match:
+            log_entry["Student Name"] = match.group(1).strip()
+            log_entry["Student ID"] = match.group(2).strip()
+        log_entry["Issues"].append(f"Grading timed out after {TIMEOUT_SUBMISSION} seconds.")
+        log_entry["Points Deducted"] = TOTAL_POINTS
+        log_entry["Final Score"] = 0
+        return log_entry
+    finally:
+        signal.alarm(0)
+        for proc in STARTED_PROGRAMS:
+            kill_program(proc)
+        del STARTED_PROGRAMS[:]
+
 ### Generate JSON Summary ###
 def generate_summary(summary, output_path):
+    """
+    Writes the summary array one entry at a time as entries arrive from the iterable,
+    flushing each one so results graded before a crash are kept.
+    Uses orjson when installed, otherwise json; both give json.dump(indent=4)'s layout.
+    """
     try:
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(summary, f, indent=4, ensure_ascii=False)
+            f.write('[')
+            separator = '\n'
+            for log in summary:
+                f.write(separator)
+                if orjson is not None:
+                    # orjson only indents by 2; doubling each line's leading spaces gives indent=4
+                    entry = orjson.dumps(log, option=orjson.OPT_INDENT_2).decode('utf-8')
+                    entry = INDENT_RE.sub(lambda m: m.group(0) * 2, entry)
+                else:
+                    entry = json.dumps(log, indent=4, ensure_ascii=False)
+                f.write(textwrap.indent(entry, ' ' * 4))
+                f.flush()
+                separator = ',\n'
+            f.write(']' if separator == '\n' else '\n]')
         logging.info(f"JSON summary generated at {output_path}")
     except Exception as e:
         logging.error(f"Failed to write JSON summary: {e}", exc_info=True)
 
 ### Main Function ###
-def main():
-    setup_logging()
+def grade_all():
+    """
+    Grades every submission folder and writes the JSON summary.
+    """
     logging.info("Starting grading process for Exercise 4 (ex4).")
     os.makedirs(SUMMARY_DIR, exist_ok=True)
     os.makedirs(LOGS_DIR, exist_ok=True)
     os.makedirs(WORKDIR, exist_ok=True)
     
     summary_file = os.path.join(SUMMARY_DIR, 'summary_ex4.json')
-    summary = []
     
-    for submission_folder in os.listdir(SUBMISSIONS_DIR):
+    submission_folders = []
+    for submission_folder in sorted(os.listdir(SUBMISSIONS_DIR)):
         submission_path = os.path.join(SUBMISSIONS_DIR, submission_folder)
         if not os.path.isdir(submission_path):
             logging.warning(f"Skipping non-directory item in submissions: {submission_folder}")
             continue
         logging.info(f"Processing submission folder: {submission_folder}")
-        log = process_submission(submission_folder)
-        # Avoid returning None in case of error.
-        if log is None:
-            continue
-        summary.append(log)
-        logging.info(f"Finished processing: {submission_folder} | Final Score: {log.get('Final Score', 'N/A')}")
+        submission_folders.append(submission_folder)
     
-    generate_summary(summary, summary_file)
+    # Grade submissions in parallel; each worker enforces TIMEOUT_SUBMISSION on its own task
+    max_workers = os.cpu_count() or 1
+    logging.info(f"Grading {len(submission_folders)} submissions with {max_workers} workers.")
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [(folder, executor.submit(grade_submission, folder)) for folder in submission_folders]
+
+        def finished_logs():
+            for submission_folder, future in futures:
+                try:
+                    log = future.result()
+                except Exception as e:
+                    logging.error(f"Grading failed for {submission_folder}: {e}", exc_info=True)
+                    continue
+                # Avoid writing None in case of error.
+                if log is None:
+                    continue
+                logging.info(f"Finished processing: {submission_folder} | Final Score: {log.get('Final Score', 'N/A')}")
+                yield log
+
+        # Entries are written in folder order, each as soon as it and those before it are graded
+        generate_summary(finished_logs(), summary_file)
     logging.info("Grading complete for Exercise 4 (ex4).")
 
+def main():
+    listener = setup_logging()
+    try:
+        grade_all()
+    finally:
+        listener.stop()
+
 if __name__ == "__main__":
     main()
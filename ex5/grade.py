@@ -2,17 +2,29 @@
 # grade_ex5.py
 
 import os
+import asyncio
+import gzip
+import io
 import tarfile
 import subprocess
 import json
+import textwrap
+import tempfile
 import re
 import logging
 import time
 from datetime import datetime
-from multiprocessing import Process, Queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from multiprocessing import Value
 import zipfile
 import shutil
 import signal
+import resource
+
+try:
+    import rapidgzip  # optional, multi-threaded gzip decompression
+except ImportError:
+    rapidgzip = None
 
 # Configuration Constants
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -20,11 +32,25 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 SUBMISSIONS_DIR = os.path.join(SCRIPT_DIR, 'submissions')
 SUMMARY_DIR = os.path.join(SCRIPT_DIR, 'summary')
 LOGS_DIR = os.path.join(SCRIPT_DIR, 'logs')
+CCACHE_DIR = os.path.join(SCRIPT_DIR, '.ccache')  # compiler cache shared by every grading run
 # For Exercise 5 we extract files in the submission folder itself.
 WORKDIR = SUBMISSIONS_DIR  
 
 GCC_COMMAND = 'gcc'
+CCACHE_COMMAND = shutil.which('ccache')  # compiler cache wrapped around gcc when installed
+CCACHE_MAX_SIZE = '1G'
+# Extracted files carry archive or extraction-time mtimes, which must not defeat the cache
+CCACHE_SLOPPINESS = 'time_macros,include_file_mtime'
 TIMEOUT_EXECUTION = 25  # seconds for program execution
+READY_TIMEOUT = 2  # longest wait for a program to be ready before starting the next one (seconds)
+READY_POLL_INTERVAL = 0.02  # seconds between readiness checks
+OUTPUT_LIMIT = 64 * 1024  # bytes of a program's output kept in the summary
+LIMIT_FILE_SIZE = 10 << 20  # bytes a program may write to a single file, its spooled output included
+EXTRACT_BUFFER_SIZE = 1 << 20  # bytes of decompressed archive read at a time when extracting
+PARALLEL_GZIP_MIN_SIZE = 8 << 20  # archives at least this large are inflated with rapidgzip or pigz
+PARALLEL_GZIP_THREADS = 4
+PIGZ_COMMAND = shutil.which('pigz')  # used for large archives when rapidgzip is not installed
+HEADER_READ_SIZE = 8192  # bytes read at a time to get the first 10 lines of a README or source file
 POINTS = {
     'archive_format': 10,          # Deduct if archive is not .tgz/.tar.gz or .zip
     'filename_correct': 10,        # Deduct if expected filenames are not exactly present
@@ -34,18 +60,36 @@ POINTS = {
 }
 TOTAL_POINTS = 100
 
-# Example seeds (if needed)
-SEED_A = "12345"  # For ex5a programs
-SEED_B = "67890"  # For ex5b programs
+# Expected source files for Exercise 5 and the executables built from them
+EXPECTED_SOURCES = {
+    "ex5a1.c": "ex5a1",
+    "ex5a2.c": "ex5a2",
+    "ex5b1.c": "ex5b1",
+    "ex5b2.c": "ex5b2",
+    "ex5b3.c": "ex5b3"
+}
+EXPECTED_SET = frozenset(EXPECTED_SOURCES)
 
+# Names checked for every submission, built once
+README_NAMES = ('readme', 'readme.txt')  # compared case-insensitively
+FOLDER_RE = re.compile(r'^(.*?)_(\d+)_assignsubmission_file$')
 
-import signal
+# coreutils' stdbuf preload library; loading it directly saves exec'ing stdbuf for every run
+STDBUF_LIBRARY_PATHS = [
+    '/usr/libexec/coreutils/libstdbuf.so',                 # RHEL / Rocky / Fedora
+    '/usr/lib/x86_64-linux-gnu/coreutils/libstdbuf.so',    # Debian / Ubuntu
+    '/usr/lib/coreutils/libstdbuf.so',
+]
+STDBUF_LIBRARY = next((path for path in STDBUF_LIBRARY_PATHS if os.path.exists(path)), None)
 
-def sigint_handler(signum, frame):
-    logging.info("Received SIGINT (ignored in grader).")
+# Example seeds (if needed)
+SEED_A = "12345"  # For ex5a programs
+SEED_B = "67890"  # For ex5b programs
 
-# In main(), add:
-signal.signal(signal.SIGINT, sigint_handler)
+# Pool worker CPU pinning, set up by main() before the workers fork
+WORKER_COUNT = 1
+WORKER_SLOTS = None  # shared counter handing each worker its index
+WORKER_PINNED = False
 
 
 ### Logging Setup ###
@@ -56,7 +100,8 @@ def setup_logging():
     logger.setLevel(logging.INFO)
     file_handler = logging.FileHandler(log_filename)
     console_handler = logging.StreamHandler()
-    file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    # Workers forked from the pool share this file, so each line carries the worker PID
+    file_formatter = logging.Formatter('%(asctime)s - %(process)d - %(levelname)s - %(message)s')
     console_formatter = logging.Formatter('%(levelname)s - %(message)s')
     file_handler.setFormatter(file_formatter)
     console_handler.setFormatter(console_formatter)
@@ -65,25 +110,49 @@ def setup_logging():
         logger.addHandler(console_handler)
 
 ### Archive Extraction ###
+def extract_with_pigz(archive, extract_to):
+    """
+    Extracts an open .tgz (positioned at its start) while a pigz process inflates it,
+    so decompression runs outside this process and alongside the tar extraction.
+    """
+    with subprocess.Popen([PIGZ_COMMAND, '-dc', f'-p{PARALLEL_GZIP_THREADS}'], stdin=archive,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE) as pigz:
+        with tarfile.open(fileobj=pigz.stdout, mode='r|') as tar_ref:
+            tar_ref.extractall(extract_to)
+        # Drain the padding after the tar end marker, so pigz never fails writing it
+        while pigz.stdout.read(EXTRACT_BUFFER_SIZE):
+            pass
+        error = pigz.stderr.read().decode('utf-8', 'replace').strip()
+        if pigz.wait() != 0:
+            raise ValueError(f"pigz could not decompress the archive: {error}")
+
 def extract_archive(archive_path, extract_to):
     try:
-        # Helper: read first two bytes from the file in binary mode.
-        def get_magic_bytes(filepath, num_bytes=2):
-            with open(filepath, 'rb') as f:
-                return f.read(num_bytes)
-        
         archive_type = None
         if archive_path.endswith(('.tgz', '.tar.gz')):
-            magic = get_magic_bytes(archive_path)
-            # The gzip magic numbers are typically: 0x1f 0x8b.
-            if magic != b'\x1f\x8b':
-                # Log that the extension is .tgz but the file's magic does not match.
-                logging.error(f"File {archive_path} has a .tgz extension but does not start with gzip magic bytes. Magic bytes: {magic.hex()}")
-                # You can decide here whether to try an alternative extraction method or mark it unsupported.
-                archive_type = "NotGzipped"
-                raise ValueError(f"File {archive_path} is not a proper gzip file. Magic bytes: {magic.hex()}")
-            with tarfile.open(archive_path, 'r:gz') as tar_ref:
-                tar_ref.extractall(extract_to)
+            # One open serves both the magic check and the extraction.
+            with open(archive_path, 'rb') as archive:
+                # pread leaves the file position at 0 for the decompressor.
+                magic = os.pread(archive.fileno(), 2, 0)
+                # The gzip magic numbers are typically: 0x1f 0x8b.
+                if magic != b'\x1f\x8b':
+                    # Log that the extension is .tgz but the file's magic does not match.
+                    logging.error(f"File {archive_path} has a .tgz extension but does not start with gzip magic bytes. Magic bytes: {magic.hex()}")
+                    # You can decide here whether to try an alternative extraction method or mark it unsupported.
+                    archive_type = "NotGzipped"
+                    raise ValueError(f"File {archive_path} is not a proper gzip file. Magic bytes: {magic.hex()}")
+                large = os.fstat(archive.fileno()).st_size >= PARALLEL_GZIP_MIN_SIZE
+                if large and rapidgzip is not None:
+                    with rapidgzip.open(archive, parallelization=PARALLEL_GZIP_THREADS) as gz, \
+                            tarfile.open(fileobj=gz, mode='r|') as tar_ref:
+                        tar_ref.extractall(extract_to)
+                elif large and PIGZ_COMMAND:
+                    extract_with_pigz(archive, extract_to)
+                else:
+                    # Stream the tar through one large read buffer instead of tarfile's small gzip reads.
+                    with gzip.GzipFile(fileobj=archive, mode='rb') as gz, \
+                            tarfile.open(fileobj=io.BufferedReader(gz, buffer_size=EXTRACT_BUFFER_SIZE), mode='r|') as tar_ref:
+                        tar_ref.extractall(extract_to)
             archive_type = "TGZ"
         elif archive_path.endswith('.zip'):
             with zipfile.ZipFile(archive_path, 'r') as zip_ref:
@@ -92,29 +161,21 @@ def extract_archive(archive_path, extract_to):
         else:
             archive_type = "Unsupported"
             raise ValueError("Unsupported archive format.")
-        
-        files = os.listdir(extract_to)
-        logging.info(f"Extracted files: {files}")
         return True, archive_type
     except Exception as e:
         logging.error(f"Failed to extract {archive_path}: {e}", exc_info=True)
         return False, str(e)
 
 ### Filename Verification ###
-def verify_files(submission_path):
-    expected = {
-        'ex5a1.c': 'ex5a1',
-        'ex5a2.c': 'ex5a2',
-        'ex5b1.c': 'ex5b1',
-        'ex5b2.c': 'ex5b2',
-        'ex5b3.c': 'ex5b3'
-    }
-    found_files = os.listdir(submission_path)
-    c_files = [f for f in found_files if f.endswith('.c')]
+def verify_files(entries):
+    absent = EXPECTED_SET - entries
+    if not absent:
+        return [], []
+    c_files = [f for f in sorted(entries) if f.endswith('.c')]
     missing = []
     wrong = []
-    for exp in expected:
-        if exp not in found_files:
+    for exp in EXPECTED_SOURCES:
+        if exp in absent:
             alternatives = [f for f in c_files if f.lower().replace(" ", "") == exp.lower().replace(" ", "")]
             if not alternatives:
                 missing.append(exp)
@@ -123,8 +184,8 @@ def verify_files(submission_path):
     return missing, wrong
 
 ### Check README Extension & Extract First 10 Lines ###
-def check_readme_extension(submission_path):
-    readme_files = [f for f in os.listdir(submission_path) if re.match(r'^readme(\.txt)?$', f, re.IGNORECASE)]
+def check_readme_extension(entries):
+    readme_files = [f for f in sorted(entries) if f.lower() in README_NAMES]
     if not readme_files:
         logging.warning("README file not found.")
         return False, None
@@ -134,11 +195,26 @@ def check_readme_extension(submission_path):
         logging.warning("README file has .txt extension.")
     return has_txt, readme_file
 
+def read_first_lines(file_path, count=10):
+    """
+    Reads the head of a file, usually in one call, and returns its first lines, stripped.
+    Missing lines are returned as empty strings, as readline() would give at end of file.
+    """
+    with open(file_path, 'rb') as f:
+        data = f.read(HEADER_READ_SIZE)
+        # Very long lines: keep reading until the lines are complete, as readline() would
+        while data.count(b'\n') < count:
+            more = f.read(HEADER_READ_SIZE)
+            if not more:
+                break
+            data += more
+    lines = [line.decode('utf-8', 'replace').strip() for line in data.splitlines()[:count]]
+    return lines + [''] * (count - len(lines))
+
 def extract_readme(submission_path, readme_file):
     readme_path = os.path.join(submission_path, readme_file)
     try:
-        with open(readme_path, 'r', encoding='utf-8') as f:
-            lines = [f.readline().strip() for _ in range(10)]
+        lines = read_first_lines(readme_path)
         logging.info(f"Extracted first 10 lines of README from {readme_file}.")
         return lines
     except Exception as e:
@@ -146,12 +222,20 @@ def extract_readme(submission_path, readme_file):
         return []
 
 ### Compilation ###
+def ccache_env():
+    return dict(os.environ, CCACHE_DIR=CCACHE_DIR, CCACHE_SLOPPINESS=CCACHE_SLOPPINESS)
+
 def compile_source(submission_path, source_file, output_executable):
     compile_cmd = [GCC_COMMAND, '-Wall', '-o', output_executable, source_file]
+    compile_env = None
+    if CCACHE_COMMAND:
+        compile_cmd = [CCACHE_COMMAND] + compile_cmd
+        compile_env = ccache_env()
     try:
         result = subprocess.run(
             compile_cmd,
             cwd=submission_path,
+            env=compile_env,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             universal_newlines=True,
@@ -173,235 +257,354 @@ def compile_source(submission_path, source_file, output_executable):
         logging.error(f"Compilation error for {source_file}: {e}", exc_info=True)
         return False, str(e)
 
-### Generic Run Program Function ###
-def run_program(submission_path, executable, arg_list, output_filename, queue):
+### Unbuffered Program Environment ###
+def unbuffered_env():
+    """
+    Environment that makes a student program's stdout unbuffered, exactly as 'stdbuf -o0' does,
+    so output printed before the program is interrupted with SIGINT is not lost.
+    Returns None (inherit the environment) when the library is not installed.
+    """
+    if STDBUF_LIBRARY is None:
+        return None
+    env = dict(os.environ)
+    preload = env.get('LD_PRELOAD')
+    env['LD_PRELOAD'] = f"{STDBUF_LIBRARY}:{preload}" if preload else STDBUF_LIBRARY
+    env['_STDBUF_O'] = '0'
+    return env
+
+### Readiness Checks ###
+async def wait_until(predicate, timeout=READY_TIMEOUT, interval=READY_POLL_INTERVAL):
     """
-    Runs a program with a list of arguments using unbuffered output.
-    Output is written to a file then read and sent via the provided queue.
+    Polls predicate until it is true or the timeout passes, replacing fixed sleeps
+    between dependent programs. Returns whether the predicate became true.
     """
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(interval)
+    return True
+
+def program_waiting(launch):
+    """
+    True once a started program has exited or is asleep in the kernel (state 'S' in
+    /proc/<pid>/stat), e.g. blocked waiting for a participant or in accept().
+    """
+    proc = launch[0]
+    if proc is None or proc.returncode is not None:
+        return True
+    try:
+        with open(f'/proc/{proc.pid}/stat', 'r') as f:
+            state = f.read().rsplit(')', 1)[1].split()[0]
+    except (OSError, IndexError):
+        return False
+    return state == 'S'
+
+### Generic Run Program Functions ###
+def run_async(coroutine):
+    """
+    Runs a coroutine on a fresh event loop (asyncio.run needs Python 3.7).
+    """
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        asyncio.set_event_loop(None)
+        loop.close()
+
+async def start_program(submission_path, executable, arg_list):
+    """
+    Starts a program in its own session using unbuffered output, with stdout and stderr
+    captured in an unlinked temporary file capped at LIMIT_FILE_SIZE. Returns (process, output_file, None), or
+    (None, None, error) when it cannot be started.
+    """
+    executable_path = os.path.join(submission_path, executable)
+    output_file = tempfile.TemporaryFile()
     try:
-        executable_path = os.path.join(submission_path, executable)
-        output_file = os.path.join(submission_path, output_filename)
         os.chmod(executable_path, 0o755)
-        # Build command with stdbuf for unbuffered output.
-        cmd = ["stdbuf", "-o0", f"./{executable}"] + [str(arg) for arg in arg_list]
+        # Unbuffered output comes from the environment, not a stdbuf wrapper process.
+        cmd = [f"./{executable}"] + [str(arg) for arg in arg_list]
         logging.info(f"Running command: {' '.join(cmd)} in {submission_path}")
-        with open(output_file, 'w') as out_f:
-            proc = subprocess.run(
-                cmd,
-                cwd=submission_path,
-                stdin=subprocess.DEVNULL,
-                stdout=out_f,
-                stderr=out_f,
-                universal_newlines=True,
-                timeout=TIMEOUT_EXECUTION
-            )
-        with open(output_file, 'r') as out_f:
-            captured = out_f.read()
-        exit_code = proc.returncode
-        message = f"{executable} Output:\n{captured.strip()}\nExit Code: {exit_code}"
-        queue.put(message)
-        try:
-            os.remove(output_file)
-        except Exception as e:
-            logging.warning(f"Could not remove output file {output_file}: {e}")
-    except subprocess.TimeoutExpired:
-        logging.error(f"{executable} execution timed out.")
-        queue.put("Execution Timeout")
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            cwd=submission_path,
+            stdin=subprocess.DEVNULL,
+            stdout=output_file,
+            stderr=subprocess.STDOUT,
+            env=unbuffered_env(),
+            start_new_session=True
+        )
     except Exception as e:
         logging.error(f"Error running {executable}: {e}", exc_info=True)
-        queue.put(f"Execution Error: {e}")
+        output_file.close()
+        return None, None, f"Execution Error: {e}"
+    limit_file_size(proc.pid)
+    return proc, output_file, None
+
+def limit_file_size(pid):
+    """
+    Caps the size of any file a started program writes, so a print loop cannot fill the disk.
+    A program writing past it is killed by SIGXFSZ.
+    """
+    try:
+        resource.prlimit(pid, resource.RLIMIT_FSIZE, (LIMIT_FILE_SIZE, LIMIT_FILE_SIZE))
+    except ProcessLookupError:
+        pass  # the program already exited
+
+async def kill_program(proc):
+    """
+    Kills a program's whole session (it may have forked) and reaps it.
+    """
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        pass
+    await proc.wait()
+
+async def collect_output(executable, launch, timeout=TIMEOUT_EXECUTION, timeout_message="Execution Timeout"):
+    """
+    Waits for a program started by start_program and returns its captured output message,
+    keeping at most OUTPUT_LIMIT bytes.
+    Completion is the program's own exit, not end of output, so a child it forked and left
+    running does not hold it up; the session is killed afterwards either way.
+    A program still running after the timeout is killed and timeout_message is returned.
+    """
+    proc, output_file, error = launch
+    if error:
+        return error
+    with output_file:
+        try:
+            await asyncio.wait_for(proc.wait(), timeout)
+        except asyncio.TimeoutError:
+            logging.error(f"{executable} did not exit within {timeout} seconds.")
+            await kill_program(proc)
+            return timeout_message
+        await kill_program(proc)
+        output_file.seek(0)
+        output = output_file.read(OUTPUT_LIMIT)
+    captured = output.decode('utf-8', 'replace')
+    return f"{executable} Output:\n{captured.strip()}\nExit Code: {proc.returncode}"
 
 ### Comments Checker ###
 def check_comments(submission_path, source_file):
     source_path = os.path.join(submission_path, source_file)
     try:
-        with open(source_path, 'r', encoding='utf-8') as f:
-            lines = [f.readline().strip() for _ in range(10)]
+        lines = read_first_lines(source_path)
         comments_present = any(line.startswith("//") or "/*" in line for line in lines if line)
         return comments_present, lines
     except Exception as e:
         logging.error(f"Failed to read {source_file}: {e}", exc_info=True)
         return False, []
 
+### Log Entry ###
+class LogEntry:
+    """
+    Grading record of one submission. Its fields live in __slots__ rather than a per-entry dict;
+    as_dict() gives the summary layout, keyed and ordered as in FIELDS.
+    """
+    FIELDS = (
+        ('student_id', "Student ID"),
+        ('student_name', "Student Name"),
+        ('submission_folder', "Submission Folder"),
+        ('archive_type', "Archive Type"),
+        ('missing_files', "Missing Files"),
+        ('wrong_filenames', "Wrong Filenames"),
+        ('compilation', "Compilation"),
+        ('compilation_warnings', "Compilation Warnings"),
+        ('compilation_errors', "Compilation Errors"),
+        ('execution_outputs', "Execution Outputs"),
+        ('comments_present', "Comments Present"),
+        ('readme_lines', "README First 10 Lines"),
+        ('issues', "Issues"),
+        ('points_deducted', "Points Deducted"),
+        ('final_score', "Final Score"),
+    )
+    __slots__ = tuple(attr for attr, _ in FIELDS)
+
+    def __init__(self, submission_folder):
+        self.student_id = ""
+        self.student_name = ""
+        self.submission_folder = submission_folder
+        self.archive_type = ""
+        self.missing_files = []
+        self.wrong_filenames = []
+        self.compilation = {}
+        self.compilation_warnings = {}
+        self.compilation_errors = {}
+        self.execution_outputs = {}
+        self.comments_present = {}
+        self.readme_lines = []
+        self.issues = []
+        self.points_deducted = 0
+        self.final_score = TOTAL_POINTS
+
+    def as_dict(self):
+        return {key: getattr(self, attr) for attr, key in self.FIELDS}
+
 ### Process a Single Submission ###
 def process_submission(submission_folder):
-    log_entry = {
-        "Student ID": "",
-        "Student Name": "",
-        "Submission Folder": submission_folder,
-        "Archive Type": "",
-        "Missing Files": [],
-        "Wrong Filenames": [],
-        "Compilation": {},
-        "Compilation Warnings": {},
-        "Compilation Errors": {},
-        "Execution Outputs": {},
-        "Comments Present": {},
-        "README First 10 Lines": [],
-        "Issues": [],
-        "Points Deducted": 0,
-        "Final Score": TOTAL_POINTS
-    }
+    log_entry = LogEntry(submission_folder)
     deductions = 0
     submission_path = os.path.join(SUBMISSIONS_DIR, submission_folder)
     
     # Extract student info (format: Name_ID_assignsubmission_file)
-    match = re.match(r'^(.*?)_(\d+)_assignsubmission_file$', submission_folder)
+    match = FOLDER_RE.match(submission_folder)
     if match:
-        log_entry["Student Name"] = match.group(1).strip()
-        log_entry["Student ID"] = match.group(2).strip()
+        log_entry.student_name = match.group(1).strip()
+        log_entry.student_id = match.group(2).strip()
     else:
-        log_entry["Issues"].append("Folder name does not match expected pattern.")
+        log_entry.issues.append("Folder name does not match expected pattern.")
         deductions += 5
     
     # Extract archive
     archives = [f for f in os.listdir(submission_path) if f.endswith(('.tgz', '.tar.gz', '.zip'))]
     if not archives:
-        log_entry["Issues"].append("No supported archive found.")
+        log_entry.issues.append("No supported archive found.")
         deductions += POINTS['archive_format']
-        log_entry["Points Deducted"] += POINTS['archive_format']
+        log_entry.points_deducted += POINTS['archive_format']
         return log_entry
     archive_file = os.path.join(submission_path, archives[0])
     success, arch_type = extract_archive(archive_file, submission_path)
     if success:
-        log_entry["Archive Type"] = arch_type
+        log_entry.archive_type = arch_type
         if arch_type not in ["TGZ", "ZIP"]:
-            log_entry["Issues"].append(f"Unsupported archive format: {arch_type}.")
+            log_entry.issues.append(f"Unsupported archive format: {arch_type}.")
             deductions += POINTS['archive_format']
-            log_entry["Points Deducted"] += POINTS['archive_format']
+            log_entry.points_deducted += POINTS['archive_format']
     else:
-        log_entry["Issues"].append("Failed to extract archive.")
+        log_entry.issues.append("Failed to extract archive.")
         deductions += POINTS['archive_format']
-        log_entry["Points Deducted"] += POINTS['archive_format']
+        log_entry.points_deducted += POINTS['archive_format']
         return log_entry
 
+    # List the extracted folder once; every check below works from this set.
+    entries = set(os.listdir(submission_path))
+    logging.info(f"Extracted files: {sorted(entries)}")
+
     # Verify required source files.
-    missing_files, wrong_files = verify_files(submission_path)
+    missing_files, wrong_files = verify_files(entries)
     if missing_files:
-        log_entry["Missing Files"] = missing_files
+        log_entry.missing_files = missing_files
         deductions += 10 * len(missing_files)
-        log_entry["Points Deducted"] += 10 * len(missing_files)
+        log_entry.points_deducted += 10 * len(missing_files)
     if wrong_files:
-        log_entry["Wrong Filenames"] = wrong_files
+        log_entry.wrong_filenames = wrong_files
         deductions += 10 * len(wrong_files)
-        log_entry["Points Deducted"] += 10 * len(wrong_files)
+        log_entry.points_deducted += 10 * len(wrong_files)
     
     # Process README.
-    has_txt, readme_filename = check_readme_extension(submission_path)
+    has_txt, readme_filename = check_readme_extension(entries)
     if not readme_filename:
-        log_entry["Issues"].append("README file missing.")
+        log_entry.issues.append("README file missing.")
         deductions += POINTS['readme_txt_extension']
-        log_entry["Points Deducted"] += POINTS['readme_txt_extension']
+        log_entry.points_deducted += POINTS['readme_txt_extension']
     else:
         if has_txt:
-            log_entry["Issues"].append("README file has .txt extension.")
+            log_entry.issues.append("README file has .txt extension.")
             deductions += POINTS['readme_txt_extension']
-            log_entry["Points Deducted"] += POINTS['readme_txt_extension']
-        log_entry["README First 10 Lines"] = extract_readme(submission_path, readme_filename)
+            log_entry.points_deducted += POINTS['readme_txt_extension']
+        log_entry.readme_lines = extract_readme(submission_path, readme_filename)
     
-    # Expected source files for Exercise 5.
-    expected_sources = {
-        "ex5a1.c": "ex5a1",
-        "ex5a2.c": "ex5a2",
-        "ex5b1.c": "ex5b1",
-        "ex5b2.c": "ex5b2",
-        "ex5b3.c": "ex5b3"
-    }
-    for src, exe in expected_sources.items():
-        src_path = os.path.join(submission_path, src)
-        if os.path.exists(src_path):
-            comp_ok, comp_msg = compile_source(submission_path, src, exe)
-            log_entry["Compilation"][src] = comp_ok
-            log_entry["Compilation Warnings"][src] = comp_msg
+    # The expected sources are independent, so gcc runs for all of them at once; the work happens
+    # in the gcc processes, so threads are enough. Results are recorded in source order below.
+    present_sources = {src: exe for src, exe in EXPECTED_SOURCES.items() if src in entries}
+    compile_results = {}
+    if present_sources:
+        with ThreadPoolExecutor(max_workers=len(present_sources)) as pool:
+            futures = {pool.submit(compile_source, submission_path, src, exe): src
+                       for src, exe in present_sources.items()}
+            for future in as_completed(futures):
+                compile_results[futures[future]] = future.result()
+    for src in EXPECTED_SOURCES:
+        if src in compile_results:
+            comp_ok, comp_msg = compile_results[src]
+            log_entry.compilation[src] = comp_ok
+            log_entry.compilation_warnings[src] = comp_msg
             if not comp_ok:
-                log_entry["Compilation Errors"][src] = comp_msg
-                log_entry["Issues"].append(f"Compilation failed for {src}.")
+                log_entry.compilation_errors[src] = comp_msg
+                log_entry.issues.append(f"Compilation failed for {src}.")
                 deductions += 10
-                log_entry["Points Deducted"] += 10
+                log_entry.points_deducted += 10
         else:
-            log_entry["Compilation"][src] = False
-            log_entry["Compilation Errors"][src] = "File not found."
-            log_entry["Issues"].append(f"{src} not found.")
+            log_entry.compilation[src] = False
+            log_entry.compilation_errors[src] = "File not found."
+            log_entry.issues.append(f"{src} not found.")
             deductions += 10
-            log_entry["Points Deducted"] += 10
+            log_entry.points_deducted += 10
 
     # Check for comments.
-    for src in expected_sources:
-        src_path = os.path.join(submission_path, src)
-        if os.path.exists(src_path):
+    for src in EXPECTED_SOURCES:
+        if src in entries:
             comments, _ = check_comments(submission_path, src)
-            log_entry["Comments Present"][src] = comments
+            log_entry.comments_present[src] = comments
         else:
-            log_entry["Comments Present"][src] = False
-    if not (log_entry["Comments Present"].get("ex5a1.c") or log_entry["Comments Present"].get("ex5b1.c")):
-        log_entry["Issues"].append("No comments in first 10 lines of manager files (ex5a1.c/ex5b1.c).")
+            log_entry.comments_present[src] = False
+    if not (log_entry.comments_present.get("ex5a1.c") or log_entry.comments_present.get("ex5b1.c")):
+        log_entry.issues.append("No comments in first 10 lines of manager files (ex5a1.c/ex5b1.c).")
         deductions += POINTS['comments_missing']
-        log_entry["Points Deducted"] += POINTS['comments_missing']
+        log_entry.points_deducted += POINTS['comments_missing']
 
     ### Execution Phase ###
-    # Helper: start_proc to launch a process with unbuffered output.
-    def start_proc(label, exe, arg_list, out_filename, submission_path):
-        q = Queue()
-        arg_list_str = [str(arg) for arg in arg_list]
-        p = Process(target=run_program, args=(submission_path, exe, arg_list_str, out_filename, q))
-        p.start()
-        return p, q
+    run_async(run_programs(submission_path, log_entry))
+
+    log_entry.points_deducted = deductions
+    log_entry.final_score = max(TOTAL_POINTS - deductions, 0)
+    return log_entry
 
+### Execution Phase ###
+async def run_programs(submission_path, log_entry):
+    """
+    Runs the Exercise 5 programs, each in its own session, and records their outputs.
+    """
     #### Exercise 5A – Duel Programs ####
-    p_5a_mgr, q_5a_mgr = start_proc("Exercise 5A Manager", "ex5a1", [], "ex5a1_output.txt", submission_path)
-    time.sleep(2)
-    p_5a_part0, q_5a_part0 = start_proc("Exercise 5A Participant 0", "ex5a2", ["0", "17"], "ex5a2_0_output.txt", submission_path)
-    p_5a_part1, q_5a_part1 = start_proc("Exercise 5A Participant 1", "ex5a2", ["1", "18"], "ex5a2_1_output.txt", submission_path)
-    for proc, q, label in [
-        (p_5a_mgr, q_5a_mgr, "Exercise 5A Manager"),
-        (p_5a_part0, q_5a_part0, "Exercise 5A Participant 0"),
-        (p_5a_part1, q_5a_part1, "Exercise 5A Participant 1")
-    ]:
-        proc.join(timeout=TIMEOUT_EXECUTION + 10)
-        if proc.is_alive():
-            proc.terminate()
-            q.put("Execution timed out.")
-        try:
-            res = q.get_nowait()
-        except Exception:
-            res = "No Output"
-        log_entry["Execution Outputs"][label] = res
+    a_mgr = await start_program(submission_path, "ex5a1", [])
+    await wait_until(lambda: program_waiting(a_mgr))  # blocked waiting for its participants
+    a_part0 = await start_program(submission_path, "ex5a2", ["0", "17"])
+    a_part1 = await start_program(submission_path, "ex5a2", ["1", "18"])
+    programs = [(a_mgr, "ex5a1", "Exercise 5A Manager"),
+                (a_part0, "ex5a2", "Exercise 5A Participant 0"),
+                (a_part1, "ex5a2", "Exercise 5A Participant 1")]
+    results = await asyncio.gather(*(collect_output(exe, launch) for launch, exe, _ in programs))
+    for (_, _, label), res in zip(programs, results):
+        log_entry.execution_outputs[label] = res
         logging.info(f"{label} Output:\n{res}")
 
     #### Exercise 5B – Server/Client Programs ####
-    p_5b_srv1, q_5b_srv1 = start_proc("Exercise 5B Prime Server", "ex5b1", [], "ex5b1_output.txt", submission_path)
-    p_5b_srv2, q_5b_srv2 = start_proc("Exercise 5B Arithmetic Server", "ex5b2", [], "ex5b2_output.txt", submission_path)
-    time.sleep(2)
-    # Prepare temporary input file for frontend.
-    temp_input_file = os.path.join(submission_path, "ex5b3_test_input.txt")
-    with open(temp_input_file, 'w') as finp:
-        finp.write("p\n15 17 2 0\n" + "a 5+3\n")
+    b_srv1 = await start_program(submission_path, "ex5b1", [])
+    b_srv2 = await start_program(submission_path, "ex5b2", [])
+    await wait_until(lambda: program_waiting(b_srv1) and program_waiting(b_srv2))  # both waiting for clients
+    # The frontend's input and output are anonymous temporary files.
     try:
-        output_file = os.path.join(submission_path, "ex5b3_output.txt")
-        cmd = ["stdbuf", "-o0", "./ex5b3"]
+        cmd = ["./ex5b3"]
         logging.info(f"Running command: {' '.join(cmd)} in {submission_path} with input from file")
-        with open(temp_input_file, 'r') as fin, open(output_file, 'w') as fout:
-            p_5b_front = subprocess.Popen(
-                cmd,
+        with tempfile.TemporaryFile(mode='w+') as fin, tempfile.TemporaryFile(mode='w+') as fout:
+            fin.write("p\n15 17 2 0\n" + "a 5+3\n")
+            fin.flush()
+            fin.seek(0)
+            p_5b_front = await asyncio.create_subprocess_exec(
+                *cmd,
                 cwd=submission_path,
                 stdin=fin,
                 stdout=fout,
                 stderr=subprocess.STDOUT,
-                universal_newlines=True,
+                env=unbuffered_env(),
                 start_new_session=True
             )
-        time.sleep(2)
-        try:
-            os.killpg(os.getpgid(p_5b_front.pid), signal.SIGINT)
-            logging.info(f"Sent SIGINT to Exercise 5B Frontend (PID: {p_5b_front.pid})")
-        except Exception as e:
-            logging.error(f"Failed to send SIGINT to Exercise 5B Frontend: {e}", exc_info=True)
-        try:
-            p_5b_front.wait(timeout=5)
-        except Exception:
-            p_5b_front.terminate()
-        with open(output_file, 'r') as fout:
+            limit_file_size(p_5b_front.pid)
+            # Let the frontend run (at most 2 seconds) until the two lines we keep are out.
+            await wait_until(lambda: p_5b_front.returncode is not None or
+                             os.pread(fout.fileno(), 4096, 0).count(b'\n') >= 2)
+            try:
+                os.killpg(p_5b_front.pid, signal.SIGINT)
+                logging.info(f"Sent SIGINT to Exercise 5B Frontend (PID: {p_5b_front.pid})")
+            except Exception as e:
+                logging.error(f"Failed to send SIGINT to Exercise 5B Frontend: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(p_5b_front.wait(), 5)
+            except asyncio.TimeoutError:
+                await kill_program(p_5b_front)
+            fout.seek(0)
             front_lines = []
             for _ in range(2):
                 line = fout.readline()
@@ -409,81 +612,121 @@ def process_submission(submission_folder):
                     break
                 front_lines.append(line.strip())
         front_summary = "\n".join(front_lines)
-        log_entry["Execution Outputs"]["Exercise 5B Frontend"] = f"ex5b3 Output (first 2 lines):\n{front_summary}"
+        log_entry.execution_outputs["Exercise 5B Frontend"] = f"ex5b3 Output (first 2 lines):\n{front_summary}"
         logging.info(f"Exercise 5B Frontend Output (first 2 lines):\n{front_summary}")
     except Exception as e:
         logging.error(f"Error running Exercise 5B Frontend: {e}", exc_info=True)
-        log_entry["Execution Outputs"]["Exercise 5B Frontend"] = f"Execution Error: {e}"
-    finally:
-        try:
-            os.remove(temp_input_file)
-        except Exception as e:
-            logging.warning(f"Could not remove temporary input file {temp_input_file}: {e}")
+        log_entry.execution_outputs["Exercise 5B Frontend"] = f"Execution Error: {e}"
 
     # Terminate the two server processes.
-    def terminate_process(proc, label, q):
-        try:
-            os.killpg(os.getpgid(proc.pid), signal.SIGINT)
-            logging.info(f"Sent SIGINT to {label} (PID: {proc.pid})")
-        except Exception as e:
-            logging.error(f"Failed to send SIGINT to {label}: {e}", exc_info=True)
-        try:
-            proc.join(timeout=5)
-        except Exception:
-            proc.terminate()
-        try:
-            q.put("Terminated after test.")
-        except Exception:
-            pass
-        logging.info(f"{label} terminated after test.")
-    for label, proc, q in [
-        ("Exercise 5B Prime Server", p_5b_srv1, q_5b_srv1),
-        ("Exercise 5B Arithmetic Server", p_5b_srv2, q_5b_srv2)
-    ]:
-        terminate_process(proc, label, q)
-        try:
-            res = q.get_nowait()
-        except Exception:
-            res = "No Output"
-        log_entry["Execution Outputs"][label] = res
+    for launch, exe, label in [(b_srv1, "ex5b1", "Exercise 5B Prime Server"),
+                               (b_srv2, "ex5b2", "Exercise 5B Arithmetic Server")]:
+        proc = launch[0]
+        if proc is not None:
+            try:
+                os.killpg(proc.pid, signal.SIGINT)
+                logging.info(f"Sent SIGINT to {label} (PID: {proc.pid})")
+            except OSError as e:
+                logging.error(f"Failed to send SIGINT to {label}: {e}")
+        res = await collect_output(exe, launch, timeout=5, timeout_message="Terminated after test.")
+        log_entry.execution_outputs[label] = res
         logging.info(f"{label} Output:\n{res}")
 
-    log_entry["Points Deducted"] = deductions
-    log_entry["Final Score"] = max(TOTAL_POINTS - deductions, 0)
-    return log_entry
+### Parallel Grading Worker ###
+def pin_worker():
+    """
+    Pins this pool worker, once, to its own share of the CPUs. The student programs it
+    starts inherit the affinity, so they do not compete with other workers' programs.
+    """
+    global WORKER_PINNED
+    if WORKER_PINNED or WORKER_SLOTS is None or not hasattr(os, 'sched_setaffinity'):
+        return
+    WORKER_PINNED = True
+    with WORKER_SLOTS.get_lock():
+        index = WORKER_SLOTS.value
+        WORKER_SLOTS.value += 1
+    cpus = sorted(os.sched_getaffinity(0))
+    share = cpus[index % WORKER_COUNT::WORKER_COUNT]
+    if share:
+        os.sched_setaffinity(0, share)
+        logging.info(f"Grading worker pinned to CPUs {share}.")
+
+def grade_submission(submission_folder):
+    """
+    Pool entry point wrapping process_submission.
+    """
+    pin_worker()
+    return process_submission(submission_folder)
 
 ### Generate JSON Summary ###
 def generate_summary(summary, output_path):
+    """
+    Writes the summary array one entry at a time as entries arrive from the iterable,
+    flushing each one so results graded before a crash are kept. The file is laid out
+    exactly as json.dump(summary, indent=4) would write it.
+    """
     try:
         with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(summary, f, indent=4, ensure_ascii=False)
+            f.write('[')
+            separator = '\n'
+            for log in summary:
+                f.write(separator)
+                f.write(textwrap.indent(json.dumps(log.as_dict(), indent=4, ensure_ascii=False), ' ' * 4))
+                f.flush()
+                separator = ',\n'
+            f.write(']' if separator == '\n' else '\n]')
         logging.info(f"JSON summary generated at {output_path}")
     except Exception as e:
         logging.error(f"Failed to write JSON summary: {e}", exc_info=True)
 
 ### Main Function ###
 def main():
+    global WORKER_COUNT, WORKER_SLOTS
     setup_logging()
     logging.info("Starting grading process for Exercise 5 (ex5).")
     os.makedirs(SUMMARY_DIR, exist_ok=True)
     os.makedirs(LOGS_DIR, exist_ok=True)
     os.makedirs(WORKDIR, exist_ok=True)
+    if CCACHE_COMMAND:
+        # Size the shared compiler cache once, before any worker compiles into it
+        subprocess.run([CCACHE_COMMAND, '-M', CCACHE_MAX_SIZE], env=ccache_env(),
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     
     summary_file = os.path.join(SUMMARY_DIR, 'summary_ex5.json')
-    summary = []
+    submission_folders = []
     
-    for submission_folder in os.listdir(SUBMISSIONS_DIR):
-        submission_path = os.path.join(SUBMISSIONS_DIR, submission_folder)
-        if not os.path.isdir(submission_path):
-            logging.warning(f"Skipping non-directory item in submissions: {submission_folder}")
-            continue
-        logging.info(f"Processing submission folder: {submission_folder}")
-        log = process_submission(submission_folder)
-        if log is not None:
-            summary.append(log)
-            logging.info(f"Finished processing: {submission_folder} | Final Score: {log.get('Final Score', 'N/A')}")
+    # scandir reports each entry's type from the directory listing itself, with no stat per folder
+    with os.scandir(SUBMISSIONS_DIR) as it:
+        for entry in it:
+            if not entry.is_dir():
+                logging.warning(f"Skipping non-directory item in submissions: {entry.name}")
+                continue
+            logging.info(f"Processing submission folder: {entry.name}")
+            submission_folders.append(entry.name)
+    submission_folders.sort()
     
-    generate_summary(summary, summary_file)
+    # Grade submissions in parallel. Each submission runs up to three programs at once,
+    # so every worker gets about two CPUs of its own.
+    WORKER_COUNT = max((os.cpu_count() or 1) // 2, 1)
+    WORKER_SLOTS = Value('i', 0)
+    logging.info(f"Grading {len(submission_folders)} submissions with {WORKER_COUNT} workers.")
+    with ProcessPoolExecutor(max_workers=WORKER_COUNT) as executor:
+        # The summary is kept in folder order; a failed submission is logged and skipped
+        futures = [(folder, executor.submit(grade_submission, folder)) for folder in submission_folders]
+
+        def finished_logs():
+            for submission_folder, future in futures:
+                try:
+                    log = future.result()
+                except Exception as e:
+                    logging.error(f"Grading failed for {submission_folder}: {e}", exc_info=True)
+                    continue
+                if log is not None:
+                    logging.info(f"Finished processing: {submission_folder} | Final Score: {log.final_score}")
+                    yield log
+
+        # Each entry is written as soon as it is graded, and not kept afterwards
+        generate_summary(finished_logs(), summary_file)
     logging.info("Grading complete for Exercise 5 (ex5).")
 
 if __name__ == "__main__":